@@ -1,15 +1,35 @@
 # %% 
+import socket
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
 import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba
+
+try:
+    from numba import njit
+except ImportError:  # Numba is optional: run the kernels as plain Python
+    def njit(*args, **kwargs):
+        return lambda func: func
 
 # ====== CONFIG ======
 API = "http://flserver.rotman.utoronto.ca:14960/v1"   # <-- update if you prefer hostname instead of IP
+URL_CASE       = f"{API}/case"
+URL_SECURITIES = f"{API}/securities"
+URL_NEWS       = f"{API}/news"
 HDRS = {"Authorization": "Basic MTox"}
 
 INTERVAL_SEC       = 10     # set to 10s per candle
 POLL_INTERVAL      = 0.2    # how often we query /securities (seconds)
+FRAME_INTERVAL     = 0.1    # how often the chart is redrawn (seconds)
 TICK_LIMIT         = 1800   # stop after this tick (use 300 if you want a short test)
 CASE_POLL_INTERVAL = 0.5    # how often we poll /case (tick & status)
 NEWS_POLL_INTERVAL = 4.0    # how often we poll /news (seconds)
@@ -19,20 +39,46 @@ VISIBLE_MAX        = None   # None = show all candles, or set e.g. 400 for speed
 # Dark Green and Dark Red (Maroon) by default
 UP_COLOR   = "#008b66"  # rising candles (Close >= Open)
 DOWN_COLOR = "#d60000"  # falling candles (Close < Open)
+UP_RGBA    = to_rgba(UP_COLOR)
+DOWN_RGBA  = to_rgba(DOWN_COLOR)
 # --------------------------------------------------------------
 
 # ---------- Setup session ----------
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled sockets keep TCP_NODELAY and add SO_KEEPALIVE."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+        ]
+        super().init_poolmanager(*args, **kwargs)
+
+
 s = requests.Session()
 s.headers.update(HDRS)
+s.headers.update({"Connection": "keep-alive"})
+# Keep pooled connections warm between polls; retry transient gateway errors
+s.mount("http://", KeepAliveAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(total=2, backoff_factor=0.1, status_forcelist=(502, 503, 504)),
+))
 # or s.auth = ("1", "1")  # depending on how auth is set up
 
 
 # ---------- Helper Functions ----------
 def get_tick_status():
     """Return the live simulator tick and status."""
-    r = s.get(f"{API}/case")
-    j = r.json()
+    r = s.get(URL_CASE, timeout=2.0)
+    j = orjson.loads(r.content)
     return j["tick"], j["status"]
+def get_last_price():
+    """Return the latest price (current index level)."""
+    # Only ask for the tracked ticker: a one-record payload per poll
+    r = s.get(URL_SECURITIES, params={"ticker": tkr}, timeout=2.0)
+    return orjson.loads(r.content)[0]['last']
+
+
 def get_news_headlines():
     """
     Return (current_news, previous_news) or (None, None) on error.
@@ -42,9 +88,9 @@ def get_news_headlines():
       - previous news is data[1]
     """
     try:
-        r = s.get(f"{API}/news")
+        r = s.get(URL_NEWS, timeout=2.0)
         r.raise_for_status()
-        data = r.json()
+        data = orjson.loads(r.content)
     except Exception:
         return None, None
 
@@ -62,12 +108,126 @@ def get_news_headlines():
     return cur, prev
 
 
-tkr = s.get(f"{API}/securities").json()[0]['ticker']
+def set_candle_geometry(i, width, min_body_height):
+    """Write the body corners, wick segments and colour of candle i."""
+    x = buckets[i] * INTERVAL_SEC
+    o, h, l, c = ohlc[i]
+
+    # Determine the top and bottom of the rectangular body
+    body_top = max(o, c)
+    body_bottom = min(o, c)
+    body_height = body_top - body_bottom
+    if body_height == 0:
+        body_height = min_body_height  # tiny body so flat candles are visible
+
+    left, right = x - width / 2, x + width / 2
+    top = body_bottom + body_height
+    body_verts[i] = ((left, body_bottom), (right, body_bottom), (right, top), (left, top))
+
+    # Wicks cover only the portions not covered by the bar; a missing wick
+    # is left as a zero-length segment, which draws nothing.
+    wick_segs[2 * i] = ((x, body_top), (x, max(h, body_top)))
+    wick_segs[2 * i + 1] = ((x, min(l, body_bottom)), (x, body_bottom))
+
+    candle_colors[i] = UP_RGBA if c >= o else DOWN_RGBA
+
+
+# ---------- Blitting helper ----------
+class BlitManager:
+    """
+    Redraw only the animated artists on top of a cached background.
+
+    Adapted from the Matplotlib blitting tutorial. The background is
+    re-captured on every full draw (e.g. after the axis limits change),
+    so the per-tick cost is independent of everything that is static.
+    """
+
+    def __init__(self, canvas, animated_artists=()):
+        self.canvas = canvas
+        self._bg = None
+        self._artists = []
+
+        for a in animated_artists:
+            self.add_artist(a)
+        # grab the background on every full draw
+        self.cid = canvas.mpl_connect("draw_event", self.on_draw)
+
+    def on_draw(self, event):
+        """Callback to register with 'draw_event'."""
+        cv = self.canvas
+        if event is not None and event.canvas != cv:
+            raise RuntimeError
+        self._bg = cv.copy_from_bbox(cv.figure.bbox)
+        self._draw_animated()
+
+    def add_artist(self, art):
+        """Add an artist to be managed (it must belong to our figure)."""
+        if art.figure != self.canvas.figure:
+            raise RuntimeError
+        art.set_animated(True)
+        self._artists.append(art)
+
+    def _draw_animated(self):
+        """Draw all of the animated artists."""
+        fig = self.canvas.figure
+        for a in self._artists:
+            fig.draw_artist(a)
+
+    def update(self):
+        """Update the screen with animated artists."""
+        cv = self.canvas
+        if self._bg is None:
+            self.on_draw(None)
+        else:
+            cv.restore_region(self._bg)
+            self._draw_animated()
+            cv.blit(cv.figure.bbox)
+        # let the GUI event loop process anything it has to do
+        cv.flush_events()
+
+
+tkr = orjson.loads(s.get(URL_SECURITIES).content)[0]['ticker']
 
 # ---------- Candlestick storage ----------
-# Each candle is a dict: {bucket, open, high, low, close}
-candles = []
-current_candle = None
+# Structure of arrays: row i of `ohlc` is (open, high, low, close) of
+# candle i and buckets[i] its time bucket. Only the first n_candles rows
+# are live; the buffers are sized for a full case and doubled if needed.
+OPEN, HIGH, LOW, CLOSE = range(4)
+N_MAX = TICK_LIMIT // INTERVAL_SEC + 1
+ohlc = np.empty((N_MAX, 4), dtype=np.float64)
+buckets = np.empty(N_MAX, dtype=np.int32)
+n_candles = 0
+
+# Draw buffers owned by the plotting side: body corners, an upper and a
+# lower wick segment per candle, and the candle colour. Only the live
+# candle's rows are rewritten on a redraw.
+body_verts = np.empty((N_MAX, 4, 2), dtype=np.float64)
+wick_segs = np.empty((2 * N_MAX, 2, 2), dtype=np.float64)
+candle_colors = np.empty((N_MAX, 4), dtype=np.float64)
+
+
+@njit(cache=True)
+def update_ohlc(ohlc, buckets, n, bucket, price):
+    """
+    Fold one price into the OHLC arrays and return the new candle count.
+
+    Starts candle n when `bucket` differs from the last candle's bucket,
+    otherwise updates high/low/close of candle n - 1 in place.
+    """
+    if n == 0 or buckets[n - 1] != bucket:
+        ohlc[n] = price
+        buckets[n] = bucket
+        return n + 1
+    row = ohlc[n - 1]
+    row[HIGH] = price if price > row[HIGH] else row[HIGH]
+    row[LOW] = price if price < row[LOW] else row[LOW]
+    row[CLOSE] = price
+    return n
+
+
+# Compile once up front so the first live tick doesn't pay for the JIT
+update_ohlc(np.empty((2, 4)), np.empty(2, dtype=np.int32), 0, 0, 0.0)
+
 
 # ---------- Matplotlib style ----------
 size = 15
@@ -85,6 +245,20 @@ fig.subplots_adjust(top=0.78)
 
 ax.set_xlabel("Time (Ticks)")
 ax.set_ylabel("Price")
+ax.yaxis.grid(True, linestyle='--', alpha=0.7)
+# Limits are set by hand from the running price range below
+ax.set_autoscale_on(False)
+
+# Persistent candle artists: closed candles share one PolyCollection for
+# bodies and one LineCollection for wicks, which only change when a new
+# candle starts and so live in the blit background. The live candle has
+# its own (animated) pair that is redrawn every tick.
+closed_bodies = PolyCollection([], alpha=0.7)
+closed_wicks = LineCollection([], linewidths=1.0)
+live_body = PolyCollection([], alpha=0.7)
+live_wicks = LineCollection([], linewidths=1.0)
+for coll in (closed_wicks, closed_bodies, live_wicks, live_body):
+    ax.add_collection(coll, autolim=False)
 
 # News texts at very top of the figure
 previous_news_text = fig.text(
@@ -106,155 +280,234 @@ info_right_text = fig.text(
     fontsize=size - 2
 )
 
+# Everything that changes per tick is animated; axes, grid, labels and
+# closed candles stay in the cached background.
+bm = BlitManager(fig.canvas, [
+    live_wicks, live_body,
+    previous_news_text, current_news_text, info_left_text, info_right_text,
+])
+# Initial full draw primes the blit background
+fig.canvas.draw()
+
 # ---------- News & case state ----------
 current_news = ""
 previous_news = ""
-last_news_poll = 0.0
-last_case_poll = 0.0
+last_news_poll = float("-inf")
+last_case_poll = float("-inf")
 tick = 0
 status = "unknown"
+price = None
+# Low/high of the visible candles, kept up to date price by price
+running_lo = float("inf")
+running_hi = float("-inf")
+
+# The poller thread writes the candle arrays and the state above; the
+# plotting side reads them. Both sides hold state_lock while they do.
+state_lock = threading.Lock()
+done = threading.Event()  # set once the case ended or polling failed
+
+# Plot-side bookkeeping
+drawn_candles = 0  # n_candles as of the last redraw
+last_frame = None  # (n_candles, price, tick, news...) shown by the last redraw
 
-# ---------- Real-time loop ----------
-t0 = time.time()
-
-while True:
-    now = time.time()
-    elapsed = now - t0
-
-    # Poll /case (tick & status) less frequently
-    if now - last_case_poll >= CASE_POLL_INTERVAL:
-        try:
-            tick, status = get_tick_status()
-        except Exception as e:
-            print("Error getting case status:", e)
-            break
-        last_case_poll = now
-        print(f"tick={tick}, status={status}")
-
-    # Stop condition: tick >= limit OR status not active/running
-    if tick >= TICK_LIMIT or status.lower() not in ("active", "running"):
-        print(f"Stopping: tick={tick}, status={status}")
-        break
-
-    # Get latest price (current index level)
-    try:
-        price = s.get(f"{API}/securities").json()[0]['last']
-    except Exception as e:
-        print("Error getting price:", e)
-     #    time.sleep(POLL_INTERVAL)
-        continue
-
-#     # In case last price is None (no trades yet)
-#     if price is None:
-#         time.sleep(POLL_INTERVAL)
-#         continue
-
-    # Poll /news only every NEWS_POLL_INTERVAL seconds
-    if now - last_news_poll >= NEWS_POLL_INTERVAL:
-        cur, prev = get_news_headlines()
-        if cur is not None:
-            current_news = cur
-        if prev is not None:
-            previous_news = prev
-        last_news_poll = now
-
-    # Determine which candle "bucket" this time belongs to
-    bucket = int(elapsed // INTERVAL_SEC)  # 0,1,2,...
-
-    if current_candle is None or bucket != current_candle["bucket"]:
-        # Start a new candle
-        current_candle = {
-            "bucket": bucket,
-            "open":  price,
-            "high":  price,
-            "low":   price,
-            "close": price,
-        }
-        candles.append(current_candle)
-    else:
-        # Update existing candle
-        current_candle["high"]  = max(current_candle["high"], price)
-        current_candle["low"]   = min(current_candle["low"],  price)
-        current_candle["close"] = price
 
-    # ---------- Redraw candlesticks ----------
-    ax.clear()
-    ax.set_xlabel("Time (Ticks)")
-    ax.set_ylabel("Price")
+# ---------- Producer: poll the API ----------
+INTERVAL_NS = INTERVAL_SEC * 1_000_000_000
+
+
+def poll_loop():
+    """Poll /case, /securities and /news and fold prices into the candles."""
+    global tick, status, price, current_news, previous_news
+    global last_case_poll, last_news_poll, ohlc, buckets, n_candles
+    global running_lo, running_hi
+
+    pool = ThreadPoolExecutor(max_workers=3)
+    t0_ns = time.monotonic_ns()
+
+    try:
+        while True:
+            now_ns = time.monotonic_ns()
+            now = now_ns / 1e9
+
+            # Fire every poll that is due this tick before waiting on any of them
+            case_poll = news_poll = None
+            if now - last_case_poll >= CASE_POLL_INTERVAL:
+                case_poll = pool.submit(get_tick_status)
+            price_poll = pool.submit(get_last_price)
+            if now - last_news_poll >= NEWS_POLL_INTERVAL:
+                news_poll = pool.submit(get_news_headlines)
+
+            # Poll /case (tick & status) less frequently
+            if case_poll is not None:
+                try:
+                    case_tick, case_status = case_poll.result()
+                except Exception as e:
+                    print("Error getting case status:", e)
+                    break
+                with state_lock:
+                    tick, status = case_tick, case_status
+                last_case_poll = now
+                print(f"tick={tick}, status={status}")
+
+            # Stop condition: tick >= limit OR status not active/running
+            if tick >= TICK_LIMIT or status.lower() not in ("active", "running"):
+                print(f"Stopping: tick={tick}, status={status}")
+                break
+
+            # Get latest price (current index level)
+            try:
+                last_price = price_poll.result()
+            except Exception as e:
+                print("Error getting price:", e)
+                continue
+
+            # Poll /news only every NEWS_POLL_INTERVAL seconds
+            cur = prev = None
+            if news_poll is not None:
+                cur, prev = news_poll.result()
+                last_news_poll = now
+
+            # Determine which candle "bucket" this time belongs to
+            bucket = (now_ns - t0_ns) // INTERVAL_NS  # 0,1,2,...
+
+            with state_lock:
+                price = last_price
+                if cur is not None:
+                    current_news = cur
+                if prev is not None:
+                    previous_news = prev
+
+                # Grow the buffers before a new candle could overflow them
+                if n_candles == len(ohlc):
+                    ohlc = np.concatenate([ohlc, np.empty_like(ohlc)])
+                    buckets = np.concatenate([buckets, np.empty_like(buckets)])
+                n_prev = n_candles
+                n_candles = update_ohlc(ohlc, buckets, n_candles, bucket, price)
+
+                if VISIBLE_MAX is not None and n_candles > VISIBLE_MAX and n_candles != n_prev:
+                    # A candle scrolled out of view: refit to the window
+                    window = ohlc[n_candles - VISIBLE_MAX:n_candles]
+                    running_lo = window[:, LOW].min()
+                    running_hi = window[:, HIGH].max()
+                else:
+                    running_lo = min(running_lo, price)
+                    running_hi = max(running_hi, price)
+
+            time.sleep(POLL_INTERVAL)
+    finally:
+        pool.shutdown(wait=False)
+        done.set()
+
+
+# ---------- Consumer: redraw at a fixed rate ----------
+def update_artists():
+    """Push the latest candle state into the artists and blit them."""
+    global drawn_candles, last_frame, body_verts, wick_segs, candle_colors
+
+    with state_lock:
+        n = n_candles
+        # The live candle's OHLC, not just the last price: a move that comes
+        # back (100 -> 105 -> 100) between frames still widens its wick
+        live_ohlc = tuple(ohlc[n - 1]) if n else None
+        frame = (n, live_ohlc, price, tick, current_news, previous_news)
+        # Nothing on screen would change: skip the redraw entirely
+        if n == 0 or frame == last_frame:
+            return
 
-    if candles:
         # Optionally only draw last VISIBLE_MAX candles for speed
-        if VISIBLE_MAX is not None and len(candles) > VISIBLE_MAX:
-            draw_candles = candles[-VISIBLE_MAX:]
-        else:
-            draw_candles = candles
+        first = 0
+        if VISIBLE_MAX is not None and n > VISIBLE_MAX:
+            first = n - VISIBLE_MAX
+        live = n - 1
 
-        xs     = [c["bucket"] * INTERVAL_SEC for c in draw_candles]
-        opens  = [c["open"]  for c in draw_candles]
-        highs  = [c["high"]  for c in draw_candles]
-        lows   = [c["low"]   for c in draw_candles]
-        closes = [c["close"] for c in draw_candles]
+        if len(body_verts) < len(ohlc):
+            # Follow the poller's buffer growth
+            body_verts = np.resize(body_verts, (len(ohlc), 4, 2))
+            wick_segs = np.resize(wick_segs, (2 * len(ohlc), 2, 2))
+            candle_colors = np.resize(candle_colors, (len(ohlc), 4))
 
         width = INTERVAL_SEC * 0.6  # candle body width in time units
 
         # Precompute a minimal visible body size for completely flat candles
-        price_range = max(highs) - min(lows)
+        price_lo, price_hi = running_lo, running_hi
+        price_range = price_hi - price_lo
         min_body_height = price_range * 0.001 if price_range > 0 else 0.01
 
-        for x, o, h, l, c in zip(xs, opens, highs, lows, closes):
-            # Use custom colors
-            color = UP_COLOR if c >= o else DOWN_COLOR
-
-            # Determine the top and bottom of the rectangular body
-            body_top = max(o, c)
-            body_bottom = min(o, c)
-
-            # --- Draw Wicks (only the portions not covered by the bar) ---
-            if h > body_top:
-                ax.vlines(x, body_top, h, color=color, linewidth=1.0)
-            if l < body_bottom:
-                ax.vlines(x, l, body_bottom, color=color, linewidth=1.0)
-
-            # --- Draw Body ---
-            body_height = abs(c - o)
-            if body_height == 0:
-                body_height = min_body_height  # tiny body so flat candles are visible
-
-            rect = Rectangle(
-                (x - width / 2, body_bottom),
-                width,
-                body_height,
-                facecolor=color,
-                edgecolor=color,
-                alpha=0.7,
-            )
-            ax.add_patch(rect)
-
-        ax.yaxis.grid(True, linestyle='--', alpha=0.7)
-        ax.set_xlim(xs[0] - INTERVAL_SEC, xs[-1] + INTERVAL_SEC)
-
-    ax.relim()
-    ax.autoscale_view()
+        # Only the live candle changes between redraws; when new candles
+        # started, the previous live one also gets its final geometry.
+        for i in range(max(drawn_candles - 1, 0), n):
+            set_candle_geometry(i, width, min_body_height)
+
+        xlim = ((buckets[first] - 1) * INTERVAL_SEC, (buckets[live] + 1) * INTERVAL_SEC)
+
+    new_candle = n != drawn_candles
+    drawn_candles = n
+    last_frame = frame
+    _, _, shown_price, shown_tick, shown_news, shown_prev_news = frame
+
+    # ---------- Update candlesticks ----------
+    live_body.set_verts(body_verts[live:n])
+    live_body.set_facecolor(candle_colors[live:n])
+    live_body.set_edgecolor(candle_colors[live:n])
+    live_wicks.set_segments(wick_segs[2 * live:2 * n])
+    live_wicks.set_color(candle_colors[live])
+
+    if new_candle:
+        # The previous candle just closed: move it into the background set
+        closed_colors = candle_colors[first:live]
+        closed_bodies.set_verts(body_verts[first:live])
+        closed_bodies.set_facecolor(closed_colors)
+        closed_bodies.set_edgecolor(closed_colors)
+        closed_wicks.set_segments(wick_segs[2 * first:2 * live])
+        closed_wicks.set_color(np.repeat(closed_colors, 2, axis=0))
+
+    # Axis limits only change with a full redraw (which also re-captures
+    # the blit background). A new candle needs one anyway, so that is when
+    # the view is refitted; in between, the y range is only widened, with
+    # headroom, once the live candle leaves it.
+    pad = price_range * 0.1 if price_range > 0 else 0.1
+    rescale = new_candle  # closed candles changed, background is stale
+    if new_candle:
+        ax.set_xlim(*xlim)
+        ax.set_ylim(price_lo - pad, price_hi + pad)
+    else:
+        ymin_cur, ymax_cur = ax.get_ylim()
+        if price_lo < ymin_cur or price_hi > ymax_cur:
+            ax.set_ylim(min(ymin_cur, price_lo - pad), max(ymax_cur, price_hi + pad))
+            rescale = True
 
     # ---------- Update info: current index level & time remaining ----------
-    remaining_ticks = max(TICK_LIMIT - tick, 0)
+    remaining_ticks = max(TICK_LIMIT - shown_tick, 0)
     rem_min = remaining_ticks // 60
     rem_sec = remaining_ticks % 60
 
     info_left_text.set_text(
-        r"$\bf{Current\ Index\ Level:}$ " + f"{price}"
+        r"$\bf{Current\ Index\ Level:}$ " + f"{shown_price}"
     )
     info_right_text.set_text(
         r"$\bf{Time\ Remaining:}$ " + f"{rem_min:02d}:{rem_sec:02d}"
     )
 
     # ---------- Update news texts (figure title area) ----------
-    previous_news_text.set_text(previous_news or "")
-    current_news_text.set_text(current_news or "")
+    previous_news_text.set_text(shown_prev_news or "")
+    current_news_text.set_text(shown_news or "")
+
+    if rescale:
+        fig.canvas.draw()
+    bm.update()
 
-    fig.canvas.draw_idle()
-    plt.pause(0.01)
-    time.sleep(POLL_INTERVAL)
+
+# ---------- Real-time loop ----------
+# HTTP polling runs on its own thread, so a slow response never stalls the
+# chart; the main thread redraws at a fixed rate and keeps the GUI event
+# loop running in between.
+poller = threading.Thread(target=poll_loop, daemon=True)
+poller.start()
+
+while not done.is_set():
+    update_artists()
+    fig.canvas.start_event_loop(FRAME_INTERVAL)
+update_artists()  # show the final state
 
 print("Done. Case ended or tick limit reached.")
 plt.ioff()
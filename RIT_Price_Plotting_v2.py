@@ -1,24 +1,45 @@
 # %% 
+import socket
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import mplfinance as mpf
-import matplotlib.dates as mdates  # for mapping datetimes to x-axis positions
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba
+from matplotlib.ticker import FuncFormatter, MultipleLocator
+
+try:
+    from numba import njit
+except ImportError:  # Numba is optional: run the kernels as plain Python
+    def njit(*args, **kwargs):
+        return lambda func: func
 
 # ====== CONFIG ======
 port = 14960
 API = f"http://flserver.rotman.utoronto.ca:{port}/v1"   # <-- update if you prefer hostname instead of IP
+URL_CASE       = f"{API}/case"
+URL_SECURITIES = f"{API}/securities"
 HDRS = {"Authorization": "Basic MTox"}
 
 INTERVAL_SEC  = 10      # set to 10s per candle
 POLL_INTERVAL = 0.2     # how often we query /securities (seconds)
 TICK_LIMIT    = 1800    # stop after this tick (use 300 if you want a short test)
+VISIBLE_MAX   = None    # None = show all candles, or set e.g. 400 for speed
 
 # ------------------ Custom Candlestick Colors ------------------
 # Dark Green and Dark Red (Maroon) by default
 UP_COLOR   = "#008b66"  # rising candles (Close >= Open)
 DOWN_COLOR = "#d60000"  # falling candles (Close < Open)
+UP_RGBA    = to_rgba(UP_COLOR)
+DOWN_RGBA  = to_rgba(DOWN_COLOR)
 # --------------------------------------------------------------
 
 mc = mpf.make_marketcolors(
@@ -35,31 +56,51 @@ mpf_style = mpf.make_mpf_style(
 )  # binance, blueskies, brasil, classic, charles, default, mike, nightclouds, starsandstripes, yahoo, sas
 
 # ---------- Setup session ----------
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled sockets keep TCP_NODELAY and add SO_KEEPALIVE."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+        ]
+        super().init_poolmanager(*args, **kwargs)
+
+
 s = requests.Session()
 s.headers.update(HDRS)
+s.headers.update({"Connection": "keep-alive"})
+# Keep pooled connections warm between polls; retry transient gateway errors
+s.mount("http://", KeepAliveAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(total=2, backoff_factor=0.1, status_forcelist=(502, 503, 504)),
+))
 # or s.auth = ("1", "0")  # depending on how auth is set up
 
 
 # ---------- Helper to get case tick & status ----------
 def get_tick_status():
     """Return the live simulator tick and status."""
-    r = s.get(f"{API}/case", timeout=2.0)
+    r = s.get(URL_CASE, timeout=2.0)
     r.raise_for_status()
-    j = r.json()
+    j = orjson.loads(r.content)
     return j["tick"], j["status"]
 
 
 # ---------- Helper to get all securities ----------
 def get_all_securities():
-    r = s.get(f"{API}/securities", timeout=2.0)
+    r = s.get(URL_SECURITIES, timeout=2.0)
     r.raise_for_status()
-    return r.json()
+    return orjson.loads(r.content)
 
 
 # ---------- Helper to get last price for specific ticker ----------
 def get_last_price(ticker):
-    securities = get_all_securities()
-    for sec in securities:
+    # Filtering server-side means each poll transfers and parses one
+    # security instead of the whole board
+    r = s.get(URL_SECURITIES, params={"ticker": ticker}, timeout=2.0)
+    r.raise_for_status()
+    for sec in orjson.loads(r.content):
         if sec["ticker"] == ticker:
             return sec["last"]
     raise KeyError(f"Ticker {ticker} not found in /securities")
@@ -75,9 +116,134 @@ TARGET_TICKER = all_tickers[0]
 print("Tracking ticker:", TARGET_TICKER)
 
 # ---------- Candlestick storage ----------
-# Each candle is a dict: {bucket, open, high, low, close}
-candles = []
-current_candle = None
+# Structure of arrays: row i of `ohlc` is (open, high, low, close) of
+# candle i and buckets[i] its time bucket. Only the first n_candles rows
+# are live; the buffers are sized for a full case and doubled if needed.
+OPEN, HIGH, LOW, CLOSE = range(4)
+N_MAX = TICK_LIMIT // INTERVAL_SEC + 1
+ohlc = np.empty((N_MAX, 4), dtype=np.float64)
+buckets = np.empty(N_MAX, dtype=np.int32)
+n_candles = 0
+
+# Wick segments (x, low) -> (x, high), one per candle. LineCollection takes
+# the (N, 2, 2) array as is, so the buffer is filled in place each tick
+# instead of building fresh point lists.
+wick_buf = np.empty((N_MAX, 2, 2), dtype=np.float64)
+
+
+@njit(cache=True)
+def update_ohlc(ohlc, buckets, n, bucket, price):
+    """
+    Fold one price into the OHLC arrays and return the new candle count.
+
+    Starts candle n when `bucket` differs from the last candle's bucket,
+    otherwise updates high/low/close of candle n - 1 in place.
+    """
+    if n == 0 or buckets[n - 1] != bucket:
+        ohlc[n] = price
+        buckets[n] = bucket
+        return n + 1
+    row = ohlc[n - 1]
+    row[HIGH] = price if price > row[HIGH] else row[HIGH]
+    row[LOW] = price if price < row[LOW] else row[LOW]
+    row[CLOSE] = price
+    return n
+
+
+# Compile once up front so the first live tick doesn't pay for the JIT
+update_ohlc(np.empty((2, 4)), np.empty(2, dtype=np.int32), 0, 0, 0.0)
+
+
+def candle_bodies(xs, bottoms, width, heights):
+    """Return the (N, 4, 2) corner array of the candle bodies centred on xs."""
+    left = xs - width / 2
+    right = xs + width / 2
+    tops = bottoms + heights
+    return np.stack([
+        np.column_stack([left, bottoms]),
+        np.column_stack([right, bottoms]),
+        np.column_stack([right, tops]),
+        np.column_stack([left, tops]),
+    ], axis=1)
+
+
+def set_candles(body_coll, wick_coll, lo, hi, width, min_body_height):
+    """Point a body/wick collection pair at candles lo..hi - 1."""
+    xs = buckets[lo:hi] * INTERVAL_SEC
+    opens, highs, lows, closes = ohlc[lo:hi].T
+
+    colors = np.where((closes >= opens)[:, None], UP_RGBA, DOWN_RGBA)
+    body_top = np.maximum(opens, closes)
+    body_bottom = np.minimum(opens, closes)
+    body_height = body_top - body_bottom
+    body_height[body_height == 0] = min_body_height
+
+    body_coll.set_verts(candle_bodies(xs, body_bottom, width, body_height))
+    body_coll.set_facecolor(colors)
+    body_coll.set_edgecolor(colors)
+
+    # Wicks span the full low-high range behind the body. Rows are indexed
+    # by candle, so the closed and live collections never share one.
+    wick_buf[lo:hi, :, 0] = xs[:, None]
+    wick_buf[lo:hi, 0, 1] = lows
+    wick_buf[lo:hi, 1, 1] = highs
+    wick_coll.set_segments(wick_buf[lo:hi])
+    wick_coll.set_color(colors)
+
+
+# ---------- Blitting helper ----------
+class BlitManager:
+    """
+    Redraw only the animated artists on top of a cached background.
+
+    Adapted from the Matplotlib blitting tutorial. The background is
+    re-captured on every full draw (e.g. after the axis limits change),
+    so the per-tick cost is independent of everything that is static.
+    """
+
+    def __init__(self, canvas, animated_artists=()):
+        self.canvas = canvas
+        self._bg = None
+        self._artists = []
+
+        for a in animated_artists:
+            self.add_artist(a)
+        # grab the background on every full draw
+        self.cid = canvas.mpl_connect("draw_event", self.on_draw)
+
+    def on_draw(self, event):
+        """Callback to register with 'draw_event'."""
+        cv = self.canvas
+        if event is not None and event.canvas != cv:
+            raise RuntimeError
+        self._bg = cv.copy_from_bbox(cv.figure.bbox)
+        self._draw_animated()
+
+    def add_artist(self, art):
+        """Add an artist to be managed (it must belong to our figure)."""
+        if art.figure != self.canvas.figure:
+            raise RuntimeError
+        art.set_animated(True)
+        self._artists.append(art)
+
+    def _draw_animated(self):
+        """Draw all of the animated artists."""
+        fig = self.canvas.figure
+        for a in self._artists:
+            fig.draw_artist(a)
+
+    def update(self):
+        """Update the screen with animated artists."""
+        cv = self.canvas
+        if self._bg is None:
+            self.on_draw(None)
+        else:
+            cv.restore_region(self._bg)
+            self._draw_animated()
+            cv.blit(cv.figure.bbox)
+        # let the GUI event loop process anything it has to do
+        cv.flush_events()
+
 
 # ---------- Matplotlib style ----------
 size = 20
@@ -92,16 +258,47 @@ fig, ax = plt.subplots(figsize=(12, 6))
 ax.set_title(f"Real-time candlestick: {TARGET_TICKER}")
 ax.set_xlabel("Time (Ticks)")
 ax.set_ylabel("Price")
+# Horizontal lines as background (y-grid only)
+ax.yaxis.grid(True, linestyle='--', alpha=0.4)
+# x is plain seconds (bucket * INTERVAL_SEC); the tick step grows with the
+# visible span and is a whole number of minutes past 30 s
+X_STEPS = (10, 20, 30, 60, 120, 300, 600)
+x_locator = MultipleLocator(X_STEPS[0])
+ax.xaxis.set_major_locator(x_locator)
+ax.xaxis.set_major_formatter(FuncFormatter(lambda v, _: f"{int(v)}"))
+
+# Persistent candle artists, mutated in place. mplfinance rebuilds every
+# bar on each call, so it is only used for the final snapshot once the
+# case is over. Closed candles only change when a new candle starts and
+# live in the blit background; the live candle has its own animated pair.
+bodies = PolyCollection([])
+wicks = LineCollection([], linewidths=1.0)
+live_body = PolyCollection([])
+live_wick = LineCollection([], linewidths=1.0)
+for coll in (wicks, bodies, live_wick, live_body):
+    ax.add_collection(coll, autolim=False)
+
+bm = BlitManager(fig.canvas, [live_wick, live_body])
+# Initial full draw primes the blit background
+fig.canvas.draw()
 
 # reference time for building a DatetimeIndex (mplfinance requirement)
 t0 = time.time()
 start_time = pd.to_datetime(t0, unit="s")
 
+INTERVAL_NS = INTERVAL_SEC * 1_000_000_000
+t0_ns = time.monotonic_ns()
+
+pool = ThreadPoolExecutor(max_workers=2)
+
 # ---------- Real-time loop ----------
 while True:
+    case_poll = pool.submit(get_tick_status)
+    price_poll = pool.submit(get_last_price, TARGET_TICKER)
+
     # Check case status
     try:
-        tick, status = get_tick_status()
+        tick, status = case_poll.result()
     except Exception as e:
         print("Error getting case status:", e)
         break
@@ -115,109 +312,96 @@ while True:
 
     # Get latest price
     try:
-        price = get_last_price(TARGET_TICKER)
+        price = price_poll.result()
     except Exception as e:
         print("Error getting price:", e)
-        time.sleep(POLL_INTERVAL)
+        fig.canvas.start_event_loop(POLL_INTERVAL)
         continue
 
     # In case last price is None (no trades yet)
     if price is None:
-        time.sleep(POLL_INTERVAL)
+        fig.canvas.start_event_loop(POLL_INTERVAL)
         continue
 
-    now = time.time()
-    elapsed = now - t0
-
     # Determine which candle "bucket" this time belongs to
-    bucket = int(elapsed // INTERVAL_SEC)  # 0,1,2,...
-
-    if current_candle is None or bucket != current_candle["bucket"]:
-        # Start a new candle
-        current_candle = {
-            "bucket": bucket,
-            "open":   price,
-            "high":   price,
-            "low":    price,
-            "close":  price,
-        }
-        candles.append(current_candle)
-    else:
-        # Update existing candle
-        current_candle["high"]  = max(current_candle["high"], price)
-        current_candle["low"]   = min(current_candle["low"],  price)
-        current_candle["close"] = price
-
-    # ---------- Redraw candlesticks (now via mplfinance) ----------
-    ax.clear()
-    ax.set_title(f"Real-time candlestick: {TARGET_TICKER}")
-    ax.set_xlabel("Time (Ticks)")
-    ax.set_ylabel("Price")
-
-    if candles:
+    bucket = (time.monotonic_ns() - t0_ns) // INTERVAL_NS  # 0,1,2,...
+
+    # Grow the buffers before a new candle could overflow them
+    if n_candles == len(ohlc):
+        ohlc = np.concatenate([ohlc, np.empty_like(ohlc)])
+        buckets = np.concatenate([buckets, np.empty_like(buckets)])
+        wick_buf = np.concatenate([wick_buf, np.empty_like(wick_buf)])
+    n_prev = n_candles
+    n_candles = update_ohlc(ohlc, buckets, n_candles, bucket, price)
+    new_candle = n_candles != n_prev
+
+    # ---------- Redraw candlesticks ----------
+    # Optionally only draw last VISIBLE_MAX candles, so the per-tick work
+    # stays constant however long the session runs
+    first = 0
+    if VISIBLE_MAX is not None and n_candles > VISIBLE_MAX:
+        first = n_candles - VISIBLE_MAX
+    live = n_candles - 1
+
+    width = INTERVAL_SEC * 0.6  # candle body width in time units
+
+    # Precompute a minimal visible body size for completely flat candles
+    price_lo = ohlc[first:n_candles, LOW].min()
+    price_hi = ohlc[first:n_candles, HIGH].max()
+    price_range = price_hi - price_lo
+    min_body_height = price_range * 0.001 if price_range > 0 else 0.01
+
+    # A new candle changes the closed set and the x range, so the view is
+    # refitted and fully redrawn (which re-captures the blit background).
+    # In between, only the live candle is blitted, unless its price left
+    # the y range.
+    margin = price_range * 0.05 if price_range > 0 else 0.05
+    rescale = new_candle
+    if new_candle:
+        set_candles(bodies, wicks, first, live, width, min_body_height)
         # xs like Method 1: 0, 10, 20, ...
-        xs = [c["bucket"] * INTERVAL_SEC for c in candles]
+        ax.set_xlim((buckets[first] - 1) * INTERVAL_SEC, (buckets[live] + 1) * INTERVAL_SEC)
+        span = (buckets[live] - buckets[first] + 2) * INTERVAL_SEC
+        x_locator.set_params(base=next((s for s in X_STEPS if span / s <= 8), X_STEPS[-1]))
+        ax.set_ylim(price_lo - margin, price_hi + margin)
+    else:
+        ymin_cur, ymax_cur = ax.get_ylim()
+        if price_lo < ymin_cur or price_hi > ymax_cur:
+            ax.set_ylim(min(ymin_cur, price_lo - margin), max(ymax_cur, price_hi + margin))
+            rescale = True
+    set_candles(live_body, live_wick, live, n_candles, width, min_body_height)
+
+    if rescale:
+        fig.canvas.draw()
+    bm.update()
+    # Wait inside the GUI event loop rather than time.sleep(), so the window
+    # keeps handling resizes and clicks between polls
+    fig.canvas.start_event_loop(POLL_INTERVAL)
+
+pool.shutdown(wait=False)
+print("Done. Case ended or tick limit reached.")
 
-        # Build datetime index for mplfinance (internal x-axis)
-        times = [
-            start_time + pd.Timedelta(seconds=x)
-            for x in xs
-        ]
+plt.ioff()
 
-        df = pd.DataFrame(
-            {
-                "Open":  [c["open"]  for c in candles],
-                "High":  [c["high"]  for c in candles],
-                "Low":   [c["low"]   for c in candles],
-                "Close": [c["close"] for c in candles],
-            },
-            index=pd.DatetimeIndex(times, name="Date"),  # mplfinance needs DatetimeIndex
-        )
-
-        # Use mplfinance to draw candles into our existing axes
-        mpf.plot(
-            df,
-            type="candle",
-            style=mpf_style,
-            ax=ax,
-            show_nontrading=True,
-        )
-
-        # Horizontal lines as background (y-grid only), like your modified Method 1
-        ax.yaxis.grid(True, linestyle='--', alpha=0.4)
-
-        # Relabel x-axis back to "Time (Ticks)" using xs, but let Matplotlib choose how many
-        xlocs = ax.get_xticks()  # these are in date-number units
-        tick_labels = []
-        for xval in xlocs:
-            dt = mdates.num2date(xval).replace(tzinfo=None)
-            secs = (dt - start_time.to_pydatetime()).total_seconds()
-            # Map back to nearest bucket index
-            bucket_idx = int(round(secs / INTERVAL_SEC))
-            if bucket_idx < 0:
-                bucket_idx = 0
-            if bucket_idx >= len(xs):
-                bucket_idx = len(xs) - 1
-            tick_labels.append(str(xs[bucket_idx]))  # label = time in ticks
-
-        ax.set_xticks(xlocs)
-        ax.set_xticklabels(tick_labels)
-        for lbl in ax.get_xticklabels():
-            lbl.set_rotation(0)
-
-        # Keep roughly same x-limits logic as Method 1
-        ax.set_xlim(times[0] - pd.Timedelta(seconds=INTERVAL_SEC),
-                    times[-1] + pd.Timedelta(seconds=INTERVAL_SEC))
-
-    ax.relim()
-    ax.autoscale_view()
-
-    fig.canvas.draw_idle()
-    plt.pause(0.01)
-    time.sleep(POLL_INTERVAL)
+# One-shot mplfinance snapshot of the whole session, shown next to the
+# live chart and saved to disk
+if n_candles:
+    times = start_time + pd.to_timedelta(buckets[:n_candles] * INTERVAL_SEC, unit="s")
+    final_df = pd.DataFrame(
+        ohlc[:n_candles],
+        columns=["Open", "High", "Low", "Close"],
+        index=pd.DatetimeIndex(times, name="Date"),  # mplfinance needs DatetimeIndex
+    )
+    final_fig, _ = mpf.plot(
+        final_df,
+        type="candle",
+        style=mpf_style,
+        title=f"{TARGET_TICKER} candlesticks",
+        show_nontrading=True,
+        returnfig=True,
+    )
+    final_fig.savefig(f"{TARGET_TICKER}_candles.png")
 
-print("Done. Case ended or tick limit reached.")
-plt.ioff()
 plt.show()
 
 # %%
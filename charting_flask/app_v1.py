@@ -5,18 +5,30 @@
 # improved version that reads /securities/history and exposes ticker/candle
 # selection via query parameters.
 import base64
+import functools
+import hashlib
 import io
 import os
+import socket
 import textwrap
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import matplotlib
 matplotlib.use("Agg")  # backend for PNG rendering (no GUI)
 import matplotlib.pyplot as plt
+import numpy as np
+import orjson
 import requests
-from flask import Flask, Response, render_template
+from flask import Flask, Response, jsonify, render_template, request
 from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-from matplotlib.patches import Rectangle
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba
+from matplotlib.figure import Figure
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
 
 app = Flask(__name__)
 
@@ -26,6 +38,9 @@ app = Flask(__name__)
 RIT_HOST = os.environ.get("RIT_HOST", "flserver.rotman.utoronto.ca")
 RIT_PORT = int(os.environ.get("RIT_PORT", "10001"))
 API = os.environ.get("RIT_API_URL", f"http://{RIT_HOST}:{RIT_PORT}/v1")
+URL_CASE       = f"{API}/case"
+URL_SECURITIES = f"{API}/securities"
+URL_NEWS       = f"{API}/news"
 
 USERNAME = os.environ.get("RIT_USERNAME", "1")
 PASSWORD = os.environ.get("RIT_PASSWORD", "1")
@@ -35,7 +50,8 @@ HDRS = {
 }
 
 INTERVAL_SEC       = 10     # set to 10s per candle
-POLL_INTERVAL      = 0.2    # original polling freq (not used for sleep here)
+POLL_INTERVAL      = 0.2    # how often the background poller updates the state
+PNG_IDLE_SEC       = 5.0    # stop pre-rendering /chart.png this long after its last request
 TICK_LIMIT         = 1800   # stop after this tick (use 300 if you want a short test)
 CASE_POLL_INTERVAL = 0.5    # how often we poll /case (tick & status)
 NEWS_POLL_INTERVAL = 4.0    # how often we poll /news (seconds)
@@ -44,22 +60,52 @@ VISIBLE_MAX        = None   # None = show all candles, or set e.g. 400 for speed
 # ------------------ Custom Candlestick Colors ------------------
 UP_COLOR   = "#008b66"  # rising candles (Close >= Open)
 DOWN_COLOR = "#d60000"  # falling candles (Close < Open)
+UP_RGBA    = to_rgba(UP_COLOR)
+DOWN_RGBA  = to_rgba(DOWN_COLOR)
 # --------------------------------------------------------------
 
 # ---------- Setup session ----------
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled sockets keep TCP_NODELAY and add SO_KEEPALIVE."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+        ]
+        super().init_poolmanager(*args, **kwargs)
+
+
 s = requests.Session()
 s.headers.update(HDRS)
+s.headers.update({"Connection": "keep-alive"})
+# Keep pooled connections warm between polls; retry transient gateway errors.
+# pool_maxsize leaves headroom over the poller's concurrent requests so no
+# socket is opened and then discarded when the pool is full.
+adapter = KeepAliveAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504)),
+)
+s.mount("http://", adapter)
+s.mount("https://", adapter)
 # or s.auth = ("1", "1")
 
+pool = ThreadPoolExecutor(max_workers=3)
+
 
 # ---------- Helper Functions ----------
 def get_tick_status():
     """Return the live simulator tick and status."""
-    r = s.get(f"{API}/case", timeout=2.0)
-    j = r.json()
+    r = s.get(URL_CASE, timeout=2.0)
+    j = orjson.loads(r.content)
     return j["tick"], j["status"]
 
 
+def get_last_price():
+    """Return the latest price (current index level)."""
+    return orjson.loads(s.get(URL_SECURITIES, timeout=2.0).content)[0]['last']
+
+
 def get_news_headlines():
     """
     Return (current_news, previous_news) or (None, None) on error.
@@ -69,9 +115,9 @@ def get_news_headlines():
       - previous news is data[1]
     """
     try:
-        r = s.get(f"{API}/news", timeout=2.0)
+        r = s.get(URL_NEWS, timeout=2.0)
         r.raise_for_status()
-        data = r.json()
+        data = orjson.loads(r.content)
     except Exception:
         return None, None
 
@@ -91,6 +137,9 @@ def get_news_headlines():
     return cur, prev
 
 
+# Headlines change every few seconds while frames are drawn several times a
+# second, so the same (text, width, max_lines) comes back over and over
+@functools.lru_cache(maxsize=64)
 def wrap_headline(text: str, width: int = 100, max_lines: int = 4) -> str:
     """
     Wrap headline to multiple lines without breaking words.
@@ -119,9 +168,33 @@ def wrap_headline(text: str, width: int = 100, max_lines: int = 4) -> str:
     return "\n".join(lines)
 
 # ---------- Candlestick + state storage ----------
-# Each candle is a dict: {bucket, open, high, low, close}
-candles = []
-current_candle = None
+# Structure of arrays: row i of `ohlc` is (open, high, low, close) of
+# candle i and buckets[i] its time bucket. Only the first n_candles rows
+# are live; the buffers are sized for a full case and doubled if needed.
+OPEN, HIGH, LOW, CLOSE = range(4)
+N_MAX = TICK_LIMIT // INTERVAL_SEC + 1
+ohlc = np.empty((N_MAX, 4), dtype=np.float64)
+buckets = np.empty(N_MAX, dtype=np.int64)
+n_candles = 0
+
+
+def update_ohlc(ohlc, buckets, n, bucket, price):
+    """
+    Fold one price into the OHLC arrays and return the new candle count.
+
+    Starts candle n when `bucket` differs from the last candle's bucket,
+    otherwise updates high/low/close of candle n - 1 in place.
+    """
+    if n == 0 or buckets[n - 1] != bucket:
+        ohlc[n] = price
+        buckets[n] = bucket
+        return n + 1
+    row = ohlc[n - 1]
+    row[HIGH] = price if price > row[HIGH] else row[HIGH]
+    row[LOW] = price if price < row[LOW] else row[LOW]
+    row[CLOSE] = price
+    return n
+
 
 size = 18
 plt.rcParams['lines.linewidth'] = 3
@@ -130,36 +203,126 @@ plt.rc('xtick', labelsize=size)
 plt.rc('ytick', labelsize=size)
 plt.rc('font', family='serif')
 
+# ---------- Persistent figure ----------
+# One Figure reused by every frame; Agg isn't thread-safe, hence render_lock
+FIG_DPI = 75  # ~1400x800 px frames
+fig = Figure(figsize=(19, 11), dpi=FIG_DPI)
+FigureCanvas(fig)
+ax = fig.add_subplot(111)
+
+# Make extra space at the top for news + info lines
+fig.subplots_adjust(top=0.78)
+
+# News texts at very top of the figure
+previous_news_text = fig.text(
+    0.5, 0.97, "", ha="center", va="top",
+    fontsize=size - 4, color="dimgray"
+)
+current_news_text = fig.text(
+    0.5, 0.91, "", ha="center", va="top",
+    fontsize=size,  # larger current-news font
+    color="#00058b", fontweight="bold"
+)
+
+# Info texts just above the graph (left: index, right: time remaining)
+info_left_text = fig.text(
+    0.1, 0.8, "", ha="left", va="bottom",
+    fontsize=size
+)
+info_right_text = fig.text(
+    0.9, 0.8, "", ha="right", va="bottom",
+    fontsize=size
+)
+
+render_lock = threading.Lock()
+
+# ~4 px per candle; beyond that, neighbouring candles are merged
+MAX_DRAWN_CANDLES = int(fig.get_figwidth() * FIG_DPI) // 4
+
+
+def downsample_candles(xs, opens, highs, lows, closes, max_candles):
+    """Merge runs of consecutive candles so at most max_candles remain."""
+    n = len(xs)
+    step = -(-n // max_candles)
+    if step <= 1:
+        return xs, opens, highs, lows, closes, 1
+    first = np.arange(0, n, step)
+    last = np.minimum(first + step, n) - 1
+    return (
+        (xs[first] + xs[last]) / 2,
+        opens[first],
+        np.maximum.reduceat(highs, first),
+        np.minimum.reduceat(lows, first),
+        closes[last],
+        step,
+    )
+
 # state for news & case
 current_news = ""
 previous_news = ""
-last_news_poll = 0.0
-last_case_poll = 0.0
+last_news_poll = float("-inf")
+last_case_poll = float("-inf")
 tick = 0
 status = "unknown"
 price = 0.0
 
-t0 = time.time()
+INTERVAL_NS = INTERVAL_SEC * 1_000_000_000
+t0_ns = time.monotonic_ns()
 finished = False  # once case ends, freeze state
 
+# The poller thread writes the state above; requests read it through
+# snapshot(). Both sides hold state_lock while they do.
+state_lock = threading.Lock()
+
 
 def update_state():
     """Replicates your while-loop state updates (without sleeping/looping)."""
     global last_case_poll, last_news_poll, tick, status, price
-    global current_news, previous_news, current_candle, candles, finished
+    global current_news, previous_news, ohlc, buckets, n_candles, finished
+
+    now_ns = time.monotonic_ns()
+    now = now_ns / 1e9
+
+    if finished:
+        return
+
+    # Fire every poll that is due before waiting on any of them
+    case_poll = news_poll = None
+    if now - last_case_poll >= CASE_POLL_INTERVAL:
+        case_poll = pool.submit(get_tick_status)
+    price_poll = pool.submit(get_last_price)
+    if now - last_news_poll >= NEWS_POLL_INTERVAL:
+        news_poll = pool.submit(get_news_headlines)
+
+    # Wait for the responses before taking the lock, so a slow API never
+    # holds up a render
+    case = None
+    if case_poll is not None:
+        try:
+            case = case_poll.result()
+        except Exception as e:
+            print("Error getting case status:", e)
+            # keep old tick/status if error
 
-    now = time.time()
-    elapsed = now - t0
+    # Get latest price (current index level)
+    try:
+        last_price = price_poll.result()
+    except Exception as e:
+        print("Error getting price:", e)
+        last_price = None  # keep old price on error
 
-    if not finished:
+    cur = prev = None
+    if news_poll is not None:
+        cur, prev = news_poll.result()
+
+    # Determine which candle "bucket" this time belongs to
+    bucket = (now_ns - t0_ns) // INTERVAL_NS  # 0,1,2,...
+
+    with state_lock:
         # Poll /case (tick & status) less frequently
-        if now - last_case_poll >= CASE_POLL_INTERVAL:
-            try:
-                tick, status = get_tick_status()
-            except Exception as e:
-                print("Error getting case status:", e)
-                # keep old tick/status if error
-            else:
+        if case_poll is not None:
+            if case is not None:
+                tick, status = case
                 last_case_poll = now
                 print(f"tick={tick}, status={status}")
 
@@ -167,48 +330,98 @@ def update_state():
             if tick >= TICK_LIMIT or status.lower() not in ("active", "running"):
                 finished = True
 
-        # Get latest price (current index level)
-        try:
-            price = s.get(f"{API}/securities", timeout=2.0).json()[0]['last']
-        except Exception as e:
-            print("Error getting price:", e)
-            # keep old price on error
+        if last_price is not None:
+            price = last_price
 
         # Poll /news only every NEWS_POLL_INTERVAL seconds
-        if now - last_news_poll >= NEWS_POLL_INTERVAL:
-            cur, prev = get_news_headlines()
+        if news_poll is not None:
             if cur is not None:
                 current_news = cur
             if prev is not None:
                 previous_news = prev
             last_news_poll = now
 
-        # Determine which candle "bucket" this time belongs to
-        bucket = int(elapsed // INTERVAL_SEC)  # 0,1,2,...
-
-        if current_candle is None or bucket != current_candle["bucket"]:
-            # Start a new candle
-            current_candle = {
-                "bucket": bucket,
-                "open":  price,
-                "high":  price,
-                "low":   price,
-                "close": price,
-            }
-            candles.append(current_candle)
-        else:
-            # Update existing candle
-            current_candle["high"]  = max(current_candle["high"], price)
-            current_candle["low"]   = min(current_candle["low"],  price)
-            current_candle["close"] = price
-
-
-def make_figure():
-    """Create a Matplotlib figure EXACTLY like your script does."""
-    fig, ax = plt.subplots(figsize=(19, 11))
-
-    # Make extra space at the top for news + info lines
-    fig.subplots_adjust(top=0.78)
+        # Grow the buffers before a new candle could overflow them
+        if n_candles == len(ohlc):
+            ohlc = np.concatenate([ohlc, np.empty_like(ohlc)])
+            buckets = np.concatenate([buckets, np.empty_like(buckets)])
+        n_candles = update_ohlc(ohlc, buckets, n_candles, bucket, price)
+
+
+def poll_loop():
+    """Keep the state fresh at a fixed rate, independent of browser refreshes."""
+    while True:
+        try:
+            update_state()
+            if time.monotonic() - last_png_request < PNG_IDLE_SEC:
+                prerender()
+        except Exception as e:
+            print("Error updating state:", e)
+        time.sleep(POLL_INTERVAL)
+
+
+def snapshot():
+    """Return a consistent copy of everything make_figure draws."""
+    with state_lock:
+        # Optionally only draw last VISIBLE_MAX candles for speed
+        first = 0
+        if VISIBLE_MAX is not None and n_candles > VISIBLE_MAX:
+            first = n_candles - VISIBLE_MAX
+        return {
+            "n_candles": n_candles,
+            "buckets": buckets[first:n_candles].copy(),
+            "ohlc": ohlc[first:n_candles].copy(),
+            "price": price,
+            "tick": tick,
+            "current_news": current_news,
+            "previous_news": previous_news,
+        }
+
+
+def frame_etag(*parts):
+    """Hash of everything a frame shows: equal tags mean identical PNGs."""
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+# (etag, png bytes) of the last rendered frame, shared by all clients. The
+# poller renders each new frame into it, so requests normally just serve it.
+last_png = (None, b"")
+# Monotonic time of the last /chart.png request; pages drawing /candles.json
+# on a canvas don't need PNGs, so nothing is pre-rendered for them
+last_png_request = float("-inf")
+# (etag, png bytes) of the final frame once the case has finished; served
+# as is from then on, without a snapshot or a render
+frozen_png = None
+
+
+def png_response(etag, render):
+    """Serve a frame as PNG, or 304 when the client already has it."""
+    global last_png
+
+    if etag in request.if_none_match:
+        resp = Response(status=304)
+    else:
+        cached_etag, png = last_png
+        if cached_etag != etag:
+            png = render()
+            last_png = (etag, png)
+        resp = Response(png, mimetype="image/png")
+    resp.set_etag(etag)
+    # Let the browser keep the frame but revalidate it on every refresh
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+def make_figure(state):
+    """Draw a snapshot() onto the shared figure; call with render_lock held."""
+    candle_buckets = state["buckets"]
+    opens, highs, lows, closes = state["ohlc"].T
+    price = state["price"]
+    tick = state["tick"]
+    current_news = state["current_news"]
+    previous_news = state["previous_news"]
+
+    ax.cla()
 
     ax.set_xlabel("Time (Ticks)", fontsize=size)
     ax.set_ylabel("Price", fontsize=size)
@@ -218,84 +431,68 @@ def make_figure():
     wrapped_current = wrap_headline(current_news or "", width=85, max_lines=4)
     wrapped_previous = wrap_headline(previous_news or "", width=110, max_lines=3)
 
-    # News texts at very top of the figure
-    previous_news_text = fig.text(
-        0.5, 0.97, "", ha="center", va="top",
-        fontsize=size - 4, color="dimgray"
-    )
-    current_news_text = fig.text(
-        0.5, 0.91, "", ha="center", va="top",
-        fontsize=size,  # larger current-news font
-        color="#00058b", fontweight="bold"
-    )
-
-    # Info texts just above the graph (left: index, right: time remaining)
-    info_left_text = fig.text(
-        0.1, 0.8, "", ha="left", va="bottom",
-        fontsize=size
-    )
-    info_right_text = fig.text(
-        0.9, 0.8, "", ha="right", va="bottom",
-        fontsize=size
-    )
-
     # ---------- Redraw candlesticks (same as your loop) ----------
     ax.yaxis.grid(True, linestyle='--', alpha=0.7)
     ax.set_xlabel("Time (Ticks)")
     ax.set_ylabel("Price")
 
-    if candles:
-        # Optionally only draw last VISIBLE_MAX candles for speed
-        if VISIBLE_MAX is not None and len(candles) > VISIBLE_MAX:
-            draw_candles = candles[-VISIBLE_MAX:]
-        else:
-            draw_candles = candles
+    if len(candle_buckets):
+        xs = candle_buckets * INTERVAL_SEC
+        ax.set_xlim(xs[0] - INTERVAL_SEC, xs[-1] + INTERVAL_SEC)
+
+        xs, opens, highs, lows, closes, step = downsample_candles(
+            xs, opens, highs, lows, closes, MAX_DRAWN_CANDLES)
 
-        xs     = [c["bucket"] * INTERVAL_SEC for c in draw_candles]
-        opens  = [c["open"]  for c in draw_candles]
-        highs  = [c["high"]  for c in draw_candles]
-        lows   = [c["low"]   for c in draw_candles]
-        closes = [c["close"] for c in draw_candles]
+        width = INTERVAL_SEC * 0.6 * step  # candle body width in time units
 
-        width = INTERVAL_SEC * 0.6  # candle body width in time units
+        # Set the limits straight from the candle extremes instead of having
+        # autoscale_view() walk the artists' data limits
+        price_lo, price_hi = lows.min(), highs.max()
+        price_range = price_hi - price_lo
+        pad = price_range * 0.02 or 0.01
+        ax.set_ylim(price_lo - pad, price_hi + pad)
 
         # Precompute a minimal visible body size for completely flat candles
-        price_range = max(highs) - min(lows)
         min_body_height = price_range * 0.001 if price_range > 0 else 0.01
 
-        for x, o, h, l, c in zip(xs, opens, highs, lows, closes):
-            # Use custom colors
-            color = UP_COLOR if c >= o else DOWN_COLOR
-
-            # Determine the top and bottom of the rectangular body
-            body_top = max(o, c)
-            body_bottom = min(o, c)
-
-            # --- Draw Wicks (only the portions not covered by the bar) ---
-            if h > body_top:
-                ax.vlines(x, body_top, h, color=color, linewidth=1.0)
-            if l < body_bottom:
-                ax.vlines(x, l, body_bottom, color=color, linewidth=1.0)
-
-            # --- Draw Body ---
-            body_height = abs(c - o)
-            if body_height == 0:
-                body_height = min_body_height  # tiny body so flat candles are visible
-
-            rect = Rectangle(
-                (x - width / 2, body_bottom),
-                width,
-                body_height,
-                facecolor=color,
-                edgecolor=color,
-                alpha=0.7,
-            )
-            ax.add_patch(rect)
-
-        ax.set_xlim(xs[0] - INTERVAL_SEC, xs[-1] + INTERVAL_SEC)
-
-    ax.relim()
-    ax.autoscale_view()
+        # Use custom colors
+        colors = np.where((closes >= opens)[:, None], UP_RGBA, DOWN_RGBA)
+
+        # Determine the top and bottom of the rectangular bodies
+        body_top = np.maximum(opens, closes)
+        body_bottom = np.minimum(opens, closes)
+        body_height = body_top - body_bottom
+        body_height[body_height == 0] = min_body_height  # tiny body so flat candles are visible
+
+        # --- Draw Wicks (only the portions not covered by the bar) ---
+        # One LineCollection for all wicks instead of a vlines call each
+        upper = highs > body_top
+        lower = lows < body_bottom
+        wick_x = np.concatenate([xs[upper], xs[lower]])
+        wick_y0 = np.concatenate([body_top[upper], lows[lower]])
+        wick_y1 = np.concatenate([highs[upper], body_bottom[lower]])
+        wick_segs = np.stack([np.column_stack([wick_x, wick_y0]),
+                              np.column_stack([wick_x, wick_y1])], axis=1)
+        ax.add_collection(LineCollection(
+            wick_segs,
+            colors=np.concatenate([colors[upper], colors[lower]]),
+            linewidths=1.0,
+        ), autolim=False)
+
+        # --- Draw Bodies ---
+        # Corners of every body as one (N, 4, 2) array for a PolyCollection,
+        # instead of a Rectangle object per candle
+        left, right = xs - width / 2, xs + width / 2
+        tops = body_bottom + body_height
+        body_verts = np.stack([
+            np.column_stack([left, body_bottom]),
+            np.column_stack([right, body_bottom]),
+            np.column_stack([right, tops]),
+            np.column_stack([left, tops]),
+        ], axis=1)
+        ax.add_collection(PolyCollection(
+            body_verts, facecolors=colors, edgecolors=colors, alpha=0.7,
+        ), autolim=False)
 
     # ---------- Update info: current index level & time remaining ----------
     remaining_ticks = max(TICK_LIMIT - tick, 0)
@@ -316,6 +513,57 @@ def make_figure():
     return fig
 
 
+def candle_payload(state):
+    """Return the chart of a snapshot() as JSON-ready data for the page to draw."""
+    opens, highs, lows, closes = state["ohlc"].T
+    remaining_ticks = max(TICK_LIMIT - state["tick"], 0)
+    return {
+        "x": (state["buckets"] * INTERVAL_SEC).tolist(),
+        "o": opens.tolist(),
+        "h": highs.tolist(),
+        "l": lows.tolist(),
+        "c": closes.tolist(),
+        "step": INTERVAL_SEC,
+        "width": INTERVAL_SEC * 0.6,  # candle body width in time units
+        "xlabel": "Time (Ticks)",
+        "info_left": [["Current Index Level:", f"{state['price']}"]],
+        "info_right": [["Time Remaining:", f"{remaining_ticks // 60:02d}:{remaining_ticks % 60:02d}"]],
+        "news": [
+            wrap_headline(state["current_news"] or "", width=85, max_lines=4),
+            wrap_headline(state["previous_news"] or "", width=110, max_lines=3),
+        ],
+    }
+
+
+def state_etag(state):
+    """Return the ETag of a snapshot()."""
+    rows = state["ohlc"]
+    # Closed candles never change, so the count plus the live candle
+    # identifies the chart
+    return frame_etag(
+        state["n_candles"], tuple(rows[-1]) if len(rows) else None,
+        state["price"], state["tick"], state["current_news"], state["previous_news"],
+    )
+
+
+def render_png(state):
+    """Render a snapshot() to PNG bytes."""
+    output = io.BytesIO()
+    with render_lock:
+        make_figure(state).canvas.print_png(output)
+    return output.getvalue()
+
+
+def prerender():
+    """Render the current frame into last_png, once per change."""
+    global last_png
+    state = snapshot()
+    etag = state_etag(state)
+    if etag != last_png[0]:
+        # One tuple assignment: readers see the old frame or the new one
+        last_png = (etag, render_png(state))
+
+
 # ---------- Flask routes ----------
 @app.route("/")
 def index():
@@ -325,14 +573,43 @@ def index():
 
 @app.route("/chart.png")
 def chart_png():
-    # update state each time the browser asks for a new frame
-    update_state()
+    global last_png_request, frozen_png
+    if frozen_png is not None:
+        etag, png = frozen_png
+        return png_response(etag, lambda: png)
+
+    last_png_request = time.monotonic()
+    # Read before the snapshot: a snapshot taken after the case finished
+    # is the final frame
+    case_over = finished
+    # The poller has usually rendered this frame already; the request only
+    # renders it when it got ahead of the poller
+    state = snapshot()
+    etag = state_etag(state)
+    resp = png_response(etag, lambda: render_png(state))
+    if case_over and last_png[0] == etag:
+        frozen_png = last_png
+    return resp
+
+
+@app.route("/candles.json")
+def candles_json():
+    # Same frame as /chart.png, as raw candles the page draws on a canvas
+    state = snapshot()
+    etag = state_etag(state)
+    if etag in request.if_none_match:
+        resp = Response(status=304)
+    else:
+        resp = jsonify(candle_payload(state))
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
 
-    fig = make_figure()
-    output = io.BytesIO()
-    FigureCanvas(fig).print_png(output)
-    plt.close(fig)
-    return Response(output.getvalue(), mimetype="image/png")
+
+# Under the debug reloader the watcher process also runs this module; only
+# the serving process should poll.
+if __name__ != "__main__" or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+    threading.Thread(target=poll_loop, daemon=True).start()
 
 
 if __name__ == "__main__":
@@ -7,18 +7,30 @@
 #
 # Run: `python app_v2.py` then open http://127.0.0.1:5000/
 import base64
+import functools
+import hashlib
 import io
 import os
+import socket
 import textwrap
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
+import numpy as np
+import orjson
 import requests
 from flask import Flask, Response, jsonify, render_template, request
 from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-from matplotlib.patches import Rectangle
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba
+from matplotlib.figure import Figure
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
 
 app = Flask(__name__)
 
@@ -27,6 +39,10 @@ app = Flask(__name__)
 RIT_HOST = os.environ.get("RIT_HOST", "flserver.rotman.utoronto.ca")
 RIT_PORT = int(os.environ.get("RIT_PORT", "10001"))
 API = os.environ.get("RIT_API_URL", f"http://{RIT_HOST}:{RIT_PORT}/v1")
+URL_CASE       = f"{API}/case"
+URL_SECURITIES = f"{API}/securities"
+URL_NEWS       = f"{API}/news"
+URL_HISTORY    = f"{API}/securities/history"
 
 USERNAME = os.environ.get("RIT_USERNAME", "1")
 PASSWORD = os.environ.get("RIT_PASSWORD", "1")
@@ -38,6 +54,9 @@ HDRS = {
 TICK_LIMIT         = int(os.environ.get("RIT_TICK_LIMIT", "1800"))  # freeze once tick>=limit (or case stops)
 CASE_POLL_INTERVAL = 0.5
 NEWS_POLL_INTERVAL = 1.0
+POLL_INTERVAL      = 0.2    # how often the background poller updates the state
+PNG_IDLE_SEC       = 5.0    # stop pre-rendering a chart's PNG this long after its last request
+CHART_IDLE_SEC     = 30.0   # forget a chart (stop polling its history) this long after its last request
 
 # History polling (avoid hammering endpoint every frame)
 HIST_POLL_INTERVAL = 0.8
@@ -49,11 +68,36 @@ VISIBLE_MAX          = None   # None = show all candles; or set e.g. 400
 # ------------------ Custom Candlestick Colors ------------------
 UP_COLOR   = "#008b66"
 DOWN_COLOR = "#d60000"
+UP_RGBA    = to_rgba(UP_COLOR)
+DOWN_RGBA  = to_rgba(DOWN_COLOR)
 # --------------------------------------------------------------
 
 # ---------- Setup session ----------
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled sockets keep TCP_NODELAY and add SO_KEEPALIVE."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+        ]
+        super().init_poolmanager(*args, **kwargs)
+
+
 s = requests.Session()
 s.headers.update(HDRS)
+s.headers.update({"Connection": "keep-alive"})
+# Keep pooled connections warm between polls; retry transient gateway errors.
+# pool_maxsize covers the poller's concurrent requests plus the request
+# threads that still call the API (e.g. /tickers) without discarding sockets.
+adapter = KeepAliveAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504)),
+)
+s.mount("http://", adapter)
+s.mount("https://", adapter)
+
+pool = ThreadPoolExecutor(max_workers=3)
 
 # ---------- Plot styling ----------
 size = 18
@@ -63,18 +107,61 @@ plt.rc("xtick", labelsize=size)
 plt.rc("ytick", labelsize=size)
 plt.rc("font", family="serif")
 
+# ---------- Persistent figure ----------
+# One Figure reused by every frame; Agg isn't thread-safe, hence render_lock
+FIG_DPI = 75  # ~1400x800 px frames
+fig = Figure(figsize=(19, 11), dpi=FIG_DPI)
+FigureCanvas(fig)
+ax = fig.add_subplot(111)
+fig.subplots_adjust(top=0.78)
+
+previous_news_text = fig.text(
+    0.5, 0.97, "", ha="center", va="top",
+    fontsize=size - 4, color="dimgray"
+)
+current_news_text = fig.text(
+    0.5, 0.91, "", ha="center", va="top",
+    fontsize=size, color="#00058b", fontweight="bold"
+)
+
+info_left_text = fig.text(0.1, 0.8, "", ha="left", va="bottom", fontsize=size)
+info_right_text = fig.text(0.9, 0.8, "", ha="right", va="bottom", fontsize=size)
+
+render_lock = threading.Lock()
+
+# ~4 px per candle; beyond that, neighbouring candles are merged
+MAX_DRAWN_CANDLES = int(fig.get_figwidth() * FIG_DPI) // 4
+
+
+def downsample_candles(xs, opens, highs, lows, closes, max_candles):
+    """Merge runs of consecutive candles so at most max_candles remain."""
+    n = len(xs)
+    step = -(-n // max_candles)
+    if step <= 1:
+        return xs, opens, highs, lows, closes, 1
+    first = np.arange(0, n, step)
+    last = np.minimum(first + step, n) - 1
+    return (
+        (xs[first] + xs[last]) / 2,
+        opens[first],
+        np.maximum.reduceat(highs, first),
+        np.minimum.reduceat(lows, first),
+        closes[last],
+        step,
+    )
+
 # ---------- Helpers ----------
 def get_tick_status():
-    r = s.get(f"{API}/case", timeout=2.0)
+    r = s.get(URL_CASE, timeout=2.0)
     r.raise_for_status()
-    j = r.json()
+    j = orjson.loads(r.content)
     return int(j["tick"]), str(j["status"])
 
 def get_news_headlines():
     try:
-        r = s.get(f"{API}/news", timeout=2.0)
+        r = s.get(URL_NEWS, timeout=2.0)
         r.raise_for_status()
-        data = r.json()
+        data = orjson.loads(r.content)
     except Exception:
         return None, None
 
@@ -93,6 +180,9 @@ def get_news_headlines():
 
     return cur, prev
 
+# Headlines change every few seconds while frames are drawn several times a
+# second, so the same (text, width, max_lines) comes back over and over
+@functools.lru_cache(maxsize=64)
 def wrap_headline(text: str, width: int = 100, max_lines: int = 4) -> str:
     if not text:
         return ""
@@ -107,9 +197,9 @@ def wrap_headline(text: str, width: int = 100, max_lines: int = 4) -> str:
     return "\n".join(lines)
 
 def get_tickers():
-    r = s.get(f"{API}/securities", timeout=2.0)
+    r = s.get(URL_SECURITIES, timeout=2.0)
     r.raise_for_status()
-    data = r.json()
+    data = orjson.loads(r.content)
     tickers = []
     if isinstance(data, list):
         for sec in data:
@@ -117,9 +207,11 @@ def get_tickers():
                 tickers.append(sec["ticker"])
     return sorted(set(tickers))
 
-def fetch_history_rows(ticker: str):
+def fetch_history_rows(ticker: str, since: int = 0):
     """
     Tries to read /securities/history in a robust way.
+    `since` asks for rows from that tick on; servers that don't support it
+    send everything, so callers still drop the rows they don't need.
     Supports:
       - list of dicts
       - dict wrapping (e.g., {"history":[...]})
@@ -130,10 +222,12 @@ def fetch_history_rows(ticker: str):
     params = {"ticker": ticker}
     # If your API supports it, this reduces payload; if not, it’s ignored safely.
     params["limit"] = HISTORY_LIMIT
+    if since > 0:
+        params["since"] = since
 
-    r = s.get(f"{API}/securities/history", params=params, timeout=3.0)
+    r = s.get(URL_HISTORY, params=params, timeout=3.0)
     r.raise_for_status()
-    data = r.json()
+    data = orjson.loads(r.content)
 
     if isinstance(data, dict):
         # common wrappers: {"history": [...]}, or {"data": [...]}
@@ -186,190 +280,364 @@ def fetch_history_rows(ticker: str):
 
 def build_candles_from_history(rows, candle_ticks: int):
     """
-    Converts history rows into candle dicts:
-      {bucket, start_tick, open, high, low, close}
+    Converts history rows into candle arrays (start_ticks, ohlc), where row i
+    of `ohlc` is (open, high, low, close) of the candle starting at start_ticks[i].
     If rows already have OHLC, we still bucket them (so you can pick candle_ticks>1).
+    Rows are sorted by tick, so each bucket is a contiguous run and the
+    per-candle reductions are done with NumPy instead of a Python loop.
     """
-    candles = []
-    cur = None
-
-    def row_close(r):
-        return r.get("close", r.get("price", None))
-
-    for r in rows:
-        tick = r["tick"]
-        price_close = row_close(r)
-        if price_close is None:
-            continue
-
-        bucket = tick // candle_ticks
-        start_tick = bucket * candle_ticks
-
-        if cur is None or bucket != cur["bucket"]:
-            # start new candle
-            o = r.get("open", price_close)
-            h = r.get("high", price_close)
-            l = r.get("low",  price_close)
-            c = r.get("close", price_close)
-
-            cur = {
-                "bucket": bucket,
-                "start_tick": start_tick,
-                "open":  float(o),
-                "high":  float(h),
-                "low":   float(l),
-                "close": float(c),
-            }
-            candles.append(cur)
-        else:
-            # update existing candle
-            h = r.get("high", price_close)
-            l = r.get("low",  price_close)
-            c = r.get("close", price_close)
-            cur["high"]  = max(cur["high"], float(h))
-            cur["low"]   = min(cur["low"],  float(l))
-            cur["close"] = float(c)
-
-    return candles
+    rows = [r for r in rows if r.get("close", r.get("price")) is not None]
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, 4), dtype=np.float64)
+
+    n = len(rows)
+    ticks = np.fromiter((r["tick"] for r in rows), dtype=np.int64, count=n)
+    closes = np.fromiter((r.get("close", r.get("price")) for r in rows), dtype=np.float64, count=n)
+    opens = np.fromiter((r.get("open", c) for r, c in zip(rows, closes)), dtype=np.float64, count=n)
+    highs = np.fromiter((r.get("high", c) for r, c in zip(rows, closes)), dtype=np.float64, count=n)
+    lows = np.fromiter((r.get("low", c) for r, c in zip(rows, closes)), dtype=np.float64, count=n)
+
+    buckets = ticks // candle_ticks
+    # First row of every bucket, and the last row (its successor's start - 1)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+
+    ohlc = np.column_stack([
+        opens[starts],
+        np.maximum.reduceat(highs, starts),
+        np.minimum.reduceat(lows, starts),
+        closes[ends],
+    ])
+    return buckets[starts] * candle_ticks, ohlc
 
 # ---------- Global state (news + cache) ----------
 current_news = ""
 previous_news = ""
-last_news_poll = 0.0
-last_case_poll = 0.0
-last_hist_poll = 0.0
+last_news_poll = float("-inf")
+last_case_poll = float("-inf")
+last_hist_poll = float("-inf")
 
 tick = 0
 status = "unknown"
 finished = False
+# Set once an update that began with the case already finished completes:
+# from then on, no chart that has candles changes again
+settled = False
+# Chart shown when a request names no ticker; resolved on the poller
+# thread, again after a case restart
+default_ticker = None
+
+# cache per ticker+candle_ticks; /chart.png registers the charts it is
+# asked for and the poller thread keeps every registered one fresh
+history_cache = {}   # key: (ticker, candle_ticks) -> dict(start_ticks, ohlc, last_price, last_tick_seen)
+# key -> monotonic time of the chart's last request; the poller forgets
+# charts idle for CHART_IDLE_SEC
+chart_access = {}
+
 
-# cache per ticker+candle_ticks
-history_cache = {}   # key: (ticker, candle_ticks) -> dict(candles, last_price, last_tick_seen)
 
-def update_state(ticker: str, candle_ticks: int):
+def empty_history():
+    """Cache entry of a chart whose history hasn't arrived yet."""
+    return {
+        "start_ticks": np.empty(0, dtype=np.int64),
+        "ohlc": np.empty((0, 4), dtype=np.float64),
+        "last_price": 0.0,
+        "last_tick_seen": -1,
+    }
+
+
+# The poller thread writes the state above; requests read it through
+# snapshot(). Both sides hold state_lock while they do.
+state_lock = threading.Lock()
+
+
+def resume_tick(cache):
+    """First tick extend_history needs again: the start of the last candle."""
+    return int(cache["start_ticks"][-1]) if len(cache["start_ticks"]) else 0
+
+
+def extend_history(cache, rows, candle_ticks: int):
+    """
+    Return a new cache entry: `cache` with its last candle rebuilt and newer
+    ones appended. Only rows from resume_tick(cache) on are bucketed, so a
+    row the server revises after we saw it (the latest tick's) still shows.
+    """
+    new_rows = [r for r in rows if r["tick"] >= resume_tick(cache)]
+    start_ticks, ohlc = build_candles_from_history(new_rows, candle_ticks)
+    if not len(ohlc):
+        return cache
+
+    # The rebuilt candles replace every cached one from the same bucket on
+    old_ticks, old_ohlc = cache["start_ticks"], cache["ohlc"]
+    keep = np.searchsorted(old_ticks, start_ticks[0])
+    old_ticks, old_ohlc = old_ticks[:keep], old_ohlc[:keep]
+    start_ticks = np.concatenate([old_ticks, start_ticks])
+    ohlc = np.concatenate([old_ohlc, ohlc])
+    if VISIBLE_MAX:
+        # Nothing older is ever drawn, so don't keep it
+        start_ticks, ohlc = start_ticks[-VISIBLE_MAX:], ohlc[-VISIBLE_MAX:]
+
+    last = new_rows[-1]
+    return {
+        "start_ticks": start_ticks,
+        "ohlc": ohlc,
+        "last_price": float(last.get("close", last.get("price", 0.0))),
+        "last_tick_seen": last["tick"],
+    }
+
+
+def store_history(ticker: str, rows, candle_sizes):
+    """Extend the cached candles of `ticker` for each candle size with rows."""
+    with state_lock:
+        caches = {c: history_cache.get((ticker, c)) or empty_history() for c in candle_sizes}
+
+    entries = {
+        (ticker, candle_ticks): extend_history(cache, rows, candle_ticks)
+        for candle_ticks, cache in caches.items()
+    }
+    with state_lock:
+        history_cache.update(entries)
+
+
+def update_state():
     global last_case_poll, last_news_poll, last_hist_poll
-    global tick, status, finished
+    global tick, status, finished, settled, default_ticker
     global current_news, previous_news
 
-    now = time.time()
+    now = time.monotonic()
+    case_over = finished
+
+    # Forget charts nobody has asked for in a while (closed tabs, typo
+    # tickers, one-off candle sizes): they stop being polled, and their
+    # candles and frames are freed. A later request registers them again.
+    with state_lock:
+        for key in [k for k, seen_at in chart_access.items() if now - seen_at > CHART_IDLE_SEC]:
+            del chart_access[key]
+            history_cache.pop(key, None)
+            png_requested.pop(key, None)
+            latest_png.pop(key, None)
+            frozen_png.pop(key, None)
+
+    # ticker -> candle sizes that still need history; a finished case
+    # keeps the charts it already has
+    watched = {}
+    # ticker -> earliest resume_tick() among its charts: the history poll
+    # only asks for rows from it on
+    since = {}
+    with state_lock:
+        for (ticker, candle_ticks), cache in history_cache.items():
+            if not (finished and len(cache["ohlc"])):
+                watched.setdefault(ticker, []).append(candle_ticks)
+                since[ticker] = min(since.get(ticker, resume_tick(cache)), resume_tick(cache))
+
+    # Fire every poll that is due before waiting on any of them. Whether
+    # the case finished is taken from the previous update.
+    case_poll = news_poll = tickers_poll = None
+    hist_polls = {}
+    if now - last_case_poll >= CASE_POLL_INTERVAL:
+        case_poll = pool.submit(get_tick_status)
+        if default_ticker is None:
+            tickers_poll = pool.submit(get_tickers)
+    if not finished and (now - last_news_poll >= NEWS_POLL_INTERVAL):
+        news_poll = pool.submit(get_news_headlines)
+    if now - last_hist_poll >= HIST_POLL_INTERVAL:
+        hist_polls = {t: pool.submit(fetch_history_rows, t, since[t]) for t in watched}
+        last_hist_poll = now
 
     # Poll /case
-    if now - last_case_poll >= CASE_POLL_INTERVAL:
+    restarted = False
+    if case_poll is not None:
         try:
-            tick, status = get_tick_status()
+            case_tick, case_status = case_poll.result()
         except Exception as e:
             print("Error getting case status:", e)
         else:
+            with state_lock:
+                # Ticks went backwards: a new case started. Every chart
+                # starts over, and the next history poll refetches it whole
+                # (a `since` poll would only return the new case's later rows).
+                restarted = case_tick < tick
+                if restarted:
+                    for key in history_cache:
+                        history_cache[key] = empty_history()
+                    frozen_png.clear()
+                    finished = settled = False
+                    default_ticker = None
+                tick, status = case_tick, case_status
             last_case_poll = now
             print(f"tick={tick}, status={status}")
 
         if tick >= TICK_LIMIT or status.lower() not in ("active", "running"):
             finished = True
 
+    # Poll /securities for the default ticker until it is known
+    if tickers_poll is not None and not restarted:
+        try:
+            tickers = tickers_poll.result()
+        except Exception as e:
+            print("Error getting tickers:", e)
+        else:
+            if tickers:
+                with state_lock:
+                    default_ticker = tickers[0]
+
     # Poll /news
-    if not finished and (now - last_news_poll >= NEWS_POLL_INTERVAL):
-        cur, prev = get_news_headlines()
-        if cur is not None:
-            current_news = cur
-        if prev is not None:
-            previous_news = prev
+    if news_poll is not None:
+        cur, prev = news_poll.result()
+        with state_lock:
+            if cur is not None:
+                current_news = cur
+            if prev is not None:
+                previous_news = prev
         last_news_poll = now
 
-    # Poll /securities/history (cached)
-    key = (ticker, candle_ticks)
-    if key not in history_cache:
-        history_cache[key] = {"candles": [], "last_price": 0.0, "last_tick_seen": -1}
-
-    if now - last_hist_poll >= HIST_POLL_INTERVAL and not (finished and history_cache[key]["candles"]):
+    # Poll /securities/history (cached); polls sent before a restart was
+    # seen asked for the old case's ticks and are dropped
+    if restarted:
+        hist_polls = {}
+    for ticker, hist_poll in hist_polls.items():
         try:
-            rows = fetch_history_rows(ticker)
-            candles = build_candles_from_history(rows, candle_ticks)
-            last_price = 0.0
-            if rows:
-                last = rows[-1]
-                last_price = float(last.get("close", last.get("price", 0.0)))
-
-            history_cache[key] = {
-                "candles": candles,
-                "last_price": last_price,
-                "last_tick_seen": rows[-1]["tick"] if rows else -1,
-            }
+            store_history(ticker, hist_poll.result(), watched[ticker])
         except Exception as e:
             print("Error fetching history:", e)
 
-        last_hist_poll = now
+    if case_over and not restarted:
+        settled = True
+
 
-def make_figure(ticker: str, candle_ticks: int):
-    fig, ax = plt.subplots(figsize=(19, 11))
-    fig.subplots_adjust(top=0.78)
+def poll_loop():
+    """Keep the state fresh at a fixed rate, independent of browser refreshes."""
+    while True:
+        try:
+            update_state()
+            prerender()
+        except Exception as e:
+            print("Error updating state:", e)
+        time.sleep(POLL_INTERVAL)
+
+
+def snapshot(ticker: str, candle_ticks: int):
+    """Return a consistent copy of everything make_figure draws for one chart."""
+    with state_lock:
+        # Cache entries are replaced whole, never mutated, so views are safe
+        cache = history_cache.get((ticker, candle_ticks)) or empty_history()
+        first = 0
+        if VISIBLE_MAX and len(cache["ohlc"]) > VISIBLE_MAX:
+            first = len(cache["ohlc"]) - VISIBLE_MAX
+        return {
+            "start_ticks": cache["start_ticks"][first:],
+            "ohlc": cache["ohlc"][first:],
+            "last_price": cache["last_price"],
+            "last_tick_seen": cache["last_tick_seen"],
+            "tick": tick,
+            "current_news": current_news,
+            "previous_news": previous_news,
+        }
+
+
+def frame_etag(*parts):
+    """Hash of everything a frame shows: equal tags mean identical PNGs."""
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+# (ticker, candle_ticks) -> (etag, png bytes) of the chart's last rendered
+# frame, shared by all clients. The poller renders each new frame into it,
+# so requests normally just serve it.
+latest_png = {}
+# (ticker, candle_ticks) -> monotonic time of its last /chart.png request;
+# charts only drawn from /candles.json on a canvas are never pre-rendered
+png_requested = {}
+# (ticker, candle_ticks) -> (etag, png bytes) of the chart's final frame once
+# the case has settled; served as is from then on, without a render
+frozen_png = {}
+
+
+def png_response(key, etag, render):
+    """Serve a frame as PNG, or 304 when the client already has it."""
+    if etag in request.if_none_match:
+        resp = Response(status=304)
+    else:
+        cached_etag, png = latest_png.get(key, (None, b""))
+        if cached_etag != etag:
+            png = render()
+            latest_png[key] = (etag, png)
+        resp = Response(png, mimetype="image/png")
+    resp.set_etag(etag)
+    # Let the browser keep the frame but revalidate it on every refresh
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+def make_figure(ticker: str, candle_ticks: int, state):
+    """Draw a snapshot() onto the shared figure; call with render_lock held."""
+    start_ticks = state["start_ticks"]
+    opens, highs, lows, closes = state["ohlc"].T
+    last_price = state["last_price"]
+    tick = state["tick"]
+    current_news = state["current_news"]
+    previous_news = state["previous_news"]
+
+    ax.cla()
 
     wrapped_current = wrap_headline(current_news or "", width=85, max_lines=4)
     wrapped_previous = wrap_headline(previous_news or "", width=110, max_lines=3)
 
-    previous_news_text = fig.text(
-        0.5, 0.97, "", ha="center", va="top",
-        fontsize=size - 4, color="dimgray"
-    )
-    current_news_text = fig.text(
-        0.5, 0.91, "", ha="center", va="top",
-        fontsize=size, color="#00058b", fontweight="bold"
-    )
-
-    info_left_text = fig.text(0.1, 0.8, "", ha="left", va="bottom", fontsize=size)
-    info_right_text = fig.text(0.9, 0.8, "", ha="right", va="bottom", fontsize=size)
-
     ax.yaxis.grid(True, linestyle="--", alpha=0.7)
     ax.set_xlabel("Tick")
     ax.set_ylabel("Price")
 
-    key = (ticker, candle_ticks)
-    cache = history_cache.get(key, {"candles": [], "last_price": 0.0})
-    candles = cache["candles"]
-    last_price = cache["last_price"]
-
-    if candles:
-        draw_candles = candles[-VISIBLE_MAX:] if (VISIBLE_MAX and len(candles) > VISIBLE_MAX) else candles
+    if len(start_ticks):
+        xs = start_ticks
+        ax.set_xlim(xs[0] - candle_ticks, xs[-1] + candle_ticks)
 
-        xs     = [c["start_tick"] for c in draw_candles]
-        opens  = [c["open"] for c in draw_candles]
-        highs  = [c["high"] for c in draw_candles]
-        lows   = [c["low"] for c in draw_candles]
-        closes = [c["close"] for c in draw_candles]
+        xs, opens, highs, lows, closes, step = downsample_candles(
+            xs, opens, highs, lows, closes, MAX_DRAWN_CANDLES)
 
-        width = candle_ticks * 0.6
+        width = candle_ticks * 0.6 * step
 
-        price_range = max(highs) - min(lows)
+        # Set the limits straight from the candle extremes instead of having
+        # autoscale_view() walk the artists' data limits
+        price_lo, price_hi = lows.min(), highs.max()
+        price_range = price_hi - price_lo
+        pad = price_range * 0.02 or 0.01
+        ax.set_ylim(price_lo - pad, price_hi + pad)
         min_body_height = price_range * 0.001 if price_range > 0 else 0.01
 
-        for x, o, h, l, c in zip(xs, opens, highs, lows, closes):
-            color = UP_COLOR if c >= o else DOWN_COLOR
-
-            body_top = max(o, c)
-            body_bottom = min(o, c)
-
-            if h > body_top:
-                ax.vlines(x, body_top, h, color=color, linewidth=1.0)
-            if l < body_bottom:
-                ax.vlines(x, l, body_bottom, color=color, linewidth=1.0)
-
-            body_height = abs(c - o)
-            if body_height == 0:
-                body_height = min_body_height
-
-            rect = Rectangle(
-                (x - width / 2, body_bottom),
-                width,
-                body_height,
-                facecolor=color,
-                edgecolor=color,
-                alpha=0.7,
-            )
-            ax.add_patch(rect)
-
-        ax.set_xlim(xs[0] - candle_ticks, xs[-1] + candle_ticks)
-
-    ax.relim()
-    ax.autoscale_view()
+        colors = np.where((closes >= opens)[:, None], UP_RGBA, DOWN_RGBA)
+
+        body_top = np.maximum(opens, closes)
+        body_bottom = np.minimum(opens, closes)
+        body_height = body_top - body_bottom
+        body_height[body_height == 0] = min_body_height
+
+        # --- Draw Wicks (only the portions not covered by the bar) ---
+        # One LineCollection for all wicks instead of a vlines call each
+        upper = highs > body_top
+        lower = lows < body_bottom
+        wick_x = np.concatenate([xs[upper], xs[lower]])
+        wick_y0 = np.concatenate([body_top[upper], lows[lower]])
+        wick_y1 = np.concatenate([highs[upper], body_bottom[lower]])
+        wick_segs = np.stack([np.column_stack([wick_x, wick_y0]),
+                              np.column_stack([wick_x, wick_y1])], axis=1)
+        ax.add_collection(LineCollection(
+            wick_segs,
+            colors=np.concatenate([colors[upper], colors[lower]]),
+            linewidths=1.0,
+        ), autolim=False)
+
+        # --- Draw Bodies ---
+        # Corners of every body as one (N, 4, 2) array for a PolyCollection,
+        # instead of a Rectangle object per candle
+        left, right = xs - width / 2, xs + width / 2
+        tops = body_bottom + body_height
+        body_verts = np.stack([
+            np.column_stack([left, body_bottom]),
+            np.column_stack([right, body_bottom]),
+            np.column_stack([right, tops]),
+            np.column_stack([left, tops]),
+        ], axis=1)
+        ax.add_collection(PolyCollection(
+            body_verts, facecolors=colors, edgecolors=colors, alpha=0.7,
+        ), autolim=False)
 
     remaining_ticks = max(TICK_LIMIT - tick, 0)
     rem_min = remaining_ticks // 60
@@ -383,29 +651,69 @@ def make_figure(ticker: str, candle_ticks: int):
 
     return fig
 
-# ---------- Routes ----------
-@app.route("/")
-def index():
-    return render_template("index.html")
 
-@app.route("/tickers")
-def tickers():
-    try:
-        return jsonify({"tickers": get_tickers()})
-    except Exception as e:
-        return jsonify({"tickers": [], "error": str(e)}), 500
+def candle_payload(ticker: str, candle_ticks: int, state):
+    """Return the chart of a snapshot() as JSON-ready data for the page to draw."""
+    opens, highs, lows, closes = state["ohlc"].T
+    remaining_ticks = max(TICK_LIMIT - state["tick"], 0)
+    return {
+        "x": state["start_ticks"].tolist(),
+        "o": opens.tolist(),
+        "h": highs.tolist(),
+        "l": lows.tolist(),
+        "c": closes.tolist(),
+        "step": candle_ticks,
+        "width": candle_ticks * 0.6,
+        "xlabel": "Tick",
+        "info_left": [["Ticker:", ticker], ["Last:", f"{state['last_price']}"]],
+        "info_right": [["Time Remaining:", f"{remaining_ticks // 60:02d}:{remaining_ticks % 60:02d}"]],
+        "news": [
+            wrap_headline(state["current_news"] or "", width=85, max_lines=4),
+            wrap_headline(state["previous_news"] or "", width=110, max_lines=3),
+        ],
+    }
+
+
+def state_etag(ticker: str, candle_ticks: int, state):
+    """Return the ETag of a snapshot()."""
+    rows = state["ohlc"]
+    return frame_etag(
+        ticker, candle_ticks, state["last_tick_seen"], len(rows),
+        tuple(rows[-1]) if len(rows) else None, state["last_price"], state["tick"],
+        state["current_news"], state["previous_news"],
+    )
 
-@app.route("/chart.png")
-def chart_png():
+
+def render_png(ticker: str, candle_ticks: int, state):
+    """Render a snapshot() to PNG bytes."""
+    output = io.BytesIO()
+    with render_lock:
+        make_figure(ticker, candle_ticks, state).canvas.print_png(output)
+    return output.getvalue()
+
+
+def prerender():
+    """Render the current frame of every chart shown as PNG, once per change."""
+    now = time.monotonic()
+    for key, requested in list(png_requested.items()):
+        if now - requested >= PNG_IDLE_SEC:
+            continue
+        state = snapshot(*key)
+        etag = state_etag(*key, state)
+        if etag != latest_png.get(key, (None, b""))[0]:
+            # One dict store: readers see the old frame or the new one
+            latest_png[key] = (etag, render_png(*key, state))
+
+
+def chart_request():
+    """Read ticker/candle from the query string and return (ticker, candle_ticks, state)."""
     ticker = request.args.get("ticker", "").strip()
     candle_ticks = request.args.get("candle", "").strip()
 
     # defaults
     if not ticker:
-        try:
-            ticker = get_tickers()[0]
-        except Exception:
-            ticker = "CRZY"
+        with state_lock:
+            ticker = default_ticker or ""
 
     try:
         candle_ticks = int(candle_ticks) if candle_ticks else DEFAULT_CANDLE_TICKS
@@ -413,13 +721,74 @@ def chart_png():
     except Exception:
         candle_ticks = DEFAULT_CANDLE_TICKS
 
-    update_state(ticker, candle_ticks)
-    fig = make_figure(ticker, candle_ticks)
+    if not ticker:
+        # The poller hasn't resolved the default ticker yet: nothing to chart
+        return ticker, candle_ticks, snapshot(ticker, candle_ticks)
 
-    output = io.BytesIO()
-    FigureCanvas(fig).print_png(output)
-    plt.close(fig)
-    return Response(output.getvalue(), mimetype="image/png")
+    key = (ticker, candle_ticks)
+    with state_lock:
+        chart_access[key] = time.monotonic()
+        first_view = key not in history_cache
+        if first_view:
+            history_cache[key] = empty_history()
+    if first_view:
+        # Fetch once so a new chart doesn't start out blank; from here on
+        # the poller keeps it fresh
+        try:
+            store_history(ticker, fetch_history_rows(ticker), [candle_ticks])
+        except Exception as e:
+            print("Error fetching history:", e)
+
+    return ticker, candle_ticks, snapshot(ticker, candle_ticks)
+
+# ---------- Routes ----------
+@app.route("/")
+def index():
+    return render_template("index.html")
+
+@app.route("/tickers")
+def tickers():
+    try:
+        return jsonify({"tickers": get_tickers()})
+    except Exception as e:
+        return jsonify({"tickers": [], "error": str(e)}), 500
+
+@app.route("/chart.png")
+def chart_png():
+    # Read before the snapshot: one taken after the case settled is final
+    case_over = settled
+    ticker, candle_ticks, state = chart_request()
+    key = (ticker, candle_ticks)
+    if key in frozen_png:
+        etag, png = frozen_png[key]
+        return png_response(key, etag, lambda: png)
+
+    png_requested[key] = time.monotonic()
+    # The poller has usually rendered this frame already; the request only
+    # renders it when it got ahead of the poller
+    etag = state_etag(ticker, candle_ticks, state)
+    resp = png_response(key, etag, lambda: render_png(ticker, candle_ticks, state))
+    if case_over and len(state["ohlc"]) and latest_png.get(key, (None, b""))[0] == etag:
+        frozen_png[key] = latest_png[key]
+    return resp
+
+@app.route("/candles.json")
+def candles_json():
+    # Same frame as /chart.png, as raw candles the page draws on a canvas
+    ticker, candle_ticks, state = chart_request()
+    etag = state_etag(ticker, candle_ticks, state)
+    if etag in request.if_none_match:
+        resp = Response(status=304)
+    else:
+        resp = jsonify(candle_payload(ticker, candle_ticks, state))
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+# Under the debug reloader the watcher process also runs this module; only
+# the serving process should poll.
+if __name__ != "__main__" or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+    threading.Thread(target=poll_loop, daemon=True).start()
 
 if __name__ == "__main__":
     app.run(debug=True)